@@ -11,12 +11,18 @@ import os
 import sys
 import json
 import argparse
+import csv
 import logging
-from pathlib import Path
-from typing import List, Dict, Any, Optional
-import pandas as pd
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import List, Dict, Any, Optional, Tuple, Iterator, Union
 from datetime import datetime
 import re
+import subprocess
+import tempfile
+import threading
+import queue
+from collections import deque
+from contextlib import closing
 
 # OCR and image processing
 import cv2
@@ -24,19 +30,94 @@ import numpy as np
 from PIL import Image
 import fitz  # PyMuPDF
 import pytesseract
-import io
+
+# Optional in-process Tesseract API, pytesseract is used when missing
+try:
+    import tesserocr
+except ImportError:
+    tesserocr = None
+
+# Optional fast JSON serializer, the json module is used when missing
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Tesseract engine and page segmentation options
+TESSERACT_CONFIG = '--oem 3 --psm 6'
+
+# Maximum number of images passed to a single Tesseract run
+OCR_BATCH_SIZE = 100
+
+# Threads recognising the pages of a single document, pool workers
+# share the CPU count between them instead
+PAGE_WORKERS = 4
+
+# Threads preprocessing pages ahead of OCR in batch mode
+PREPROCESS_WORKERS = 2
+
+# Separator placed between the text of consecutive pages
+PAGE_SEPARATOR = '\n\x0c\n'
+
+# Resolution PDF pages are rendered at, within MAX_IMAGE_EDGE
+TARGET_DPI = 300
+
+# PDF pages whose text layer is longer than this skip OCR
+MIN_TEXT_LAYER_CHARS = 100
+
+# Longest image edge fed to OCR, large enough for A4 (3508 px) and
+# Letter (3300 px) pages at TARGET_DPI
+MAX_IMAGE_EDGE = 3600
+
+# Denoising applied before contrast enhancement
+DENOISE_METHODS = ('none', 'median', 'nlmeans')
+
+# Extraction patterns, compiled once per process
+_VENDOR_PATTERNS = [re.compile(p, re.IGNORECASE) for p in (
+    r'([A-Z][A-Za-z\s&\.]+(?:LIMITED|LTD|COMPANY|CORP|INC))',
+    r'([A-Z][A-Za-z\s&\.]{10,50})',
+)]
+_INVNO_PATTERNS = [re.compile(p, re.IGNORECASE | re.MULTILINE) for p in (
+    r'INVOICE[#\s]*:?\s*([A-Z0-9\-]{3,20})',
+    r'INV[#\s]*:?\s*([A-Z0-9\-]{3,20})',
+    r'NO[#\s]*:?\s*([A-Z0-9\-]{3,20})',
+    r'(?:^|\s)([A-Z]{2,4}-\d{4,8})(?:\s|$)',
+)]
+_DATE_PATTERNS = [re.compile(p) for p in (
+    r'(\d{1,2}[\/\-\.]\d{1,2}[\/\-\.]\d{4})',
+    r'(\d{1,2}\s+[A-Za-z]{3,9}\s+\d{4})',
+    r'([A-Za-z]{3,9}\s+\d{1,2},?\s+\d{4})',
+)]
+_TOTAL_PATTERNS = [re.compile(p, re.IGNORECASE | re.MULTILINE) for p in (
+    r'TOTAL[:\s]*([\d,]+\.?\d{0,2})',
+    r'GRAND\s*TOTAL[:\s]*([\d,]+\.?\d{0,2})',
+)]
+_LINE_END_AMOUNT_RE = re.compile(r'([\d,]+\.\d{2})(?=\s*$)')
+_AMOUNT_RE = re.compile(r'([\d,]+\.\d{2})')
+_NUMERIC_ONLY_RE = re.compile(r'^[\d\s\-\.\,\/]+$')
+_EIGHT_DIGITS_RE = re.compile(r'^\d{8}$')
+
+
 class InvoiceScanner:
     """Assignment-compliant invoice scanner"""
     
-    def __init__(self, tesseract_path: str = None):
-        """Initialize scanner with Tesseract path"""
+    def __init__(self, tesseract_path: str = None, denoise: str = 'median',
+                 page_workers: int = PAGE_WORKERS):
+        """Initialize scanner with Tesseract path, denoising method and page OCR threads"""
         self.supported_formats = {'.pdf', '.png', '.jpg', '.jpeg', '.tiff', '.bmp', '.txt'}
 
+        if denoise not in DENOISE_METHODS:
+            raise ValueError(f"Unknown denoise method: {denoise}")
+        self.denoise = denoise
+        self.page_workers = max(1, page_workers)
+
+        # CLAHE objects keep internal buffers, so each thread gets its own
+        self._thread_local = threading.local()
+
         # Set Tesseract path
         if tesseract_path:
             pytesseract.pytesseract.tesseract_cmd = tesseract_path
@@ -45,27 +126,59 @@ class InvoiceScanner:
         elif os.path.exists(r'C:\Program Files\Tesseract-OCR\tesseract.exe'):
             pytesseract.pytesseract.tesseract_cmd = r'C:\Program Files\Tesseract-OCR\tesseract.exe'
 
+        # Load tessdata once and keep the API for every image
+        self._api = None
+        self._api_lock = threading.Lock()
+        if tesserocr is not None:
+            try:
+                self._api = tesserocr.PyTessBaseAPI(psm=tesserocr.PSM.SINGLE_BLOCK, oem=tesserocr.OEM.DEFAULT)
+            except RuntimeError as e:
+                logger.warning(f"tesserocr initialization failed, using pytesseract: {e}")
+
         logger.info("Invoice scanner initialized")
     
+    def __del__(self):
+        """Release the Tesseract API"""
+        if getattr(self, '_api', None) is not None:
+            self._api.End()
+    
     def scan_directory(self, input_dir: str) -> List[str]:
         """Scan directory for supported invoice files"""
         files = []
-        input_path = Path(input_dir)
         
-        if not input_path.exists():
+        if not os.path.isdir(input_dir):
             logger.error(f"Input directory not found: {input_dir}")
             return files
         
-        for file_path in input_path.rglob('*'):
-            if file_path.is_file() and file_path.suffix.lower() in self.supported_formats:
-                files.append(str(file_path))
+        # DirEntry type checks reuse the directory listing, no stat per file
+        stack = [input_dir]
+        while stack:
+            try:
+                entries = list(os.scandir(stack.pop()))
+            except OSError as e:
+                logger.warning(f"Cannot read directory: {e}")
+                continue
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                elif entry.is_file() and os.path.splitext(entry.name)[1].lower() in self.supported_formats:
+                    files.append(entry.path)
         
         logger.info(f"Found {len(files)} supported files")
         return files
     
-    def preprocess_image(self, image: Image.Image) -> Image.Image:
+    @property
+    def _clahe(self) -> cv2.CLAHE:
+        """CLAHE instance cached for the current thread"""
+        clahe = getattr(self._thread_local, 'clahe', None)
+        if clahe is None:
+            clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8,8))
+            self._thread_local.clahe = clahe
+        return clahe
+    
+    def preprocess_image(self, image: Union[Image.Image, np.ndarray]) -> np.ndarray:
         """Enhanced image preprocessing for better OCR"""
-        img_array = np.array(image)
+        img_array = image if isinstance(image, np.ndarray) else np.array(image)
         
         # Convert to grayscale
         if len(img_array.shape) == 3:
@@ -73,105 +186,320 @@ class InvoiceScanner:
         else:
             gray = img_array
         
+        # Downscale oversize images, extra pixels only slow down OCR
+        h, w = gray.shape
+        scale = min(1.0, MAX_IMAGE_EDGE / max(h, w))
+        if scale < 1.0:
+            gray = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        
         # Apply denoising and enhancement
-        denoised = cv2.fastNlMeansDenoising(gray)
-        clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8,8))
-        enhanced = clahe.apply(denoised)
+        if self.denoise == 'median':
+            denoised = cv2.medianBlur(gray, 3)
+        elif self.denoise == 'nlmeans':
+            denoised = cv2.fastNlMeansDenoising(gray)
+        else:
+            denoised = gray
+        enhanced = self._clahe.apply(denoised)
         thresh = cv2.adaptiveThreshold(enhanced, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, 11, 2)
         
-        return Image.fromarray(thresh)
+        return thresh
     
+    def _page_zoom(self, page: fitz.Page) -> float:
+        """Render zoom reaching TARGET_DPI, capped so the long edge fits MAX_IMAGE_EDGE"""
+        # Page sizes are in points, 72 per inch
+        zoom = TARGET_DPI / 72.0
+        return min(zoom, MAX_IMAGE_EDGE / max(page.rect.width, page.rect.height))
+
+    def load_pages(self, file_path: str) -> Iterator[Union[str, Image.Image, np.ndarray]]:
+        """Load PDF or image file as page images, or as page text where a PDF page has a text layer"""
+        # Handle PDF files, rendering one page at a time
+        if file_path.lower().endswith('.pdf'):
+            doc = fitz.open(file_path)
+            try:
+                for page in doc:
+                    # Pages with enough embedded text need no rendering or OCR
+                    text = page.get_text("text").strip()
+                    if len(text) > MIN_TEXT_LAYER_CHARS:
+                        yield text
+                        continue
+
+                    zoom = self._page_zoom(page)
+                    mat = fitz.Matrix(zoom, zoom)
+                    pix = page.get_pixmap(matrix=mat)
+                    # Use the raw RGB samples, no PNG encode/decode round trip
+                    page_array = np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.h, pix.w, pix.n)
+                    if pix.n == 4:
+                        page_array = page_array[:, :, :3]
+                    yield page_array
+            finally:
+                doc.close()
+            return
+
+        # Handle image files
+        yield Image.open(file_path)
+
+    def _ocr_image(self, image: Union[Image.Image, np.ndarray]) -> str:
+        """Preprocess and OCR a single page image"""
+        return self._recognize(self.preprocess_image(image))
+
+    def _recognize(self, processed_image: np.ndarray) -> str:
+        """OCR a preprocessed page image"""
+        if self._api is not None:
+            # The API holds per-image state, one page at a time
+            with self._api_lock:
+                self._api.SetImage(Image.fromarray(processed_image))
+                return self._api.GetUTF8Text().strip()
+        return pytesseract.image_to_string(processed_image, config=TESSERACT_CONFIG).strip()
+
+    def _page_future(self, executor: ThreadPoolExecutor, fn, page: Union[str, Image.Image, np.ndarray]) -> Future:
+        """Submit work for an image page, text layer pages are already done"""
+        if isinstance(page, str):
+            future = Future()
+            future.set_result(page)
+            return future
+        return executor.submit(fn, page)
+
+    def _text_source(self, text_layer_pages: List[bool]) -> str:
+        """Describe where the text of a document's pages came from"""
+        if text_layer_pages and all(text_layer_pages):
+            return 'text_layer'
+        return 'mixed' if any(text_layer_pages) else 'ocr'
+
     def perform_ocr(self, file_path: str) -> Optional[str]:
         """Perform OCR on file with error handling"""
+        text, _ = self._read_file(file_path)
+        return text
+
+    def _read_file(self, file_path: str) -> Tuple[Optional[str], Optional[str]]:
+        """Return text of a file and where it came from"""
         try:
+            # Nothing was read from a missing file
             if not os.path.exists(file_path):
-                return None
+                return None, None
 
             # Handle text files directly
             if file_path.lower().endswith('.txt'):
                 with open(file_path, 'r', encoding='utf-8') as f:
-                    return f.read().strip()
-
-            # Handle PDF files
-            if file_path.lower().endswith('.pdf'):
-                doc = fitz.open(file_path)
-                if len(doc) == 0:
-                    doc.close()
-                    return None
-
-                page = doc[0]
-                mat = fitz.Matrix(3.0, 3.0)  # High resolution
-                pix = page.get_pixmap(matrix=mat)
-                img_data = pix.tobytes("png")
-                image = Image.open(io.BytesIO(img_data))
-                doc.close()
+                    return f.read().strip(), 'text_file'
+
+            # Render pages while earlier pages are being recognised, pages
+            # with a text layer are used as they are.
+            # PyMuPDF is not thread safe, so rendering stays in this thread,
+            # and it waits once a page per thread plus one is in flight.
+            pages = []
+            text_layer_pages = []
+            in_flight = deque()
+            with ThreadPoolExecutor(max_workers=self.page_workers) as executor:
+                for page in self.load_pages(file_path):
+                    if len(in_flight) > self.page_workers:
+                        pages.append(in_flight.popleft().result())
+                    in_flight.append(self._page_future(executor, self._ocr_image, page))
+                    text_layer_pages.append(isinstance(page, str))
+                pages.extend(future.result() for future in in_flight)
+
+            text = PAGE_SEPARATOR.join(page for page in pages if page)
+            return (text if text else None), self._text_source(text_layer_pages)
+
+        except Exception as e:
+            logger.error(f"OCR failed for {file_path}: {e}")
+            return None, 'ocr'
+
+    def perform_ocr_batch(self, file_paths: List[str]) -> List[Optional[str]]:
+        """Perform OCR on many files, one Tesseract run per batch of images"""
+        return [text for text, _ in self._read_batch(file_paths)]
+
+    def _read_batch(self, file_paths: List[str]) -> List[Tuple[Optional[str], Optional[str]]]:
+        """Return text and text source of each file, OCR batched by OCR_BATCH_SIZE"""
+        texts: List[Tuple[Optional[str], Optional[str]]] = []
+        for start in range(0, len(file_paths), OCR_BATCH_SIZE):
+            texts.extend(self._ocr_batch(file_paths[start:start + OCR_BATCH_SIZE]))
+        return texts
+
+    def _ocr_batch(self, file_paths: List[str]) -> List[Tuple[Optional[str], Optional[str]]]:
+        """OCR a batch of files through the load, preprocess and OCR pipeline"""
+        texts: List[Tuple[Optional[str], Optional[str]]] = [(None, 'ocr')] * len(file_paths)
+
+        # Text files and missing files need no page pipeline
+        image_indices = []
+        for i, file_path in enumerate(file_paths):
+            if not os.path.exists(file_path) or file_path.lower().endswith('.txt'):
+                texts[i] = self._read_file(file_path)
+            else:
+                image_indices.append(i)
+        if not image_indices:
+            return texts
+
+        failed = set()
+        # Closing the pipeline stops its loader thread before any fallback
+        # below opens files with PyMuPDF on this thread
+        with closing(self._preprocessed_pages([file_paths[i] for i in image_indices], failed)) as pages:
+            if self._api is not None:
+                # In-process OCR keeps up with the pipeline page by page
+                page_texts = []
+                for j, page in pages:
+                    if isinstance(page, str):
+                        page_texts.append((j, page, True))
+                        continue
+                    try:
+                        page_texts.append((j, self._recognize(page), False))
+                    except Exception as e:
+                        logger.error(f"OCR failed for {file_paths[image_indices[j]]}: {e}")
+                        failed.add(j)
             else:
-                # Handle image files
-                image = Image.open(file_path)
+                page_texts = self._recognize_batch(pages)
+
+        if page_texts is None:
+            for i in image_indices:
+                texts[i] = self._read_file(file_paths[i])
+            return texts
+
+        # Reassemble the pages of each file
+        file_pages: Dict[int, List[str]] = {}
+        file_text_layer_pages: Dict[int, List[bool]] = {}
+        for j, page, from_text_layer in page_texts:
+            if j in failed:
+                continue
+            i = image_indices[j]
+            file_text_layer_pages.setdefault(i, []).append(from_text_layer)
+            if page:
+                file_pages.setdefault(i, []).append(page)
+        for i, text_layer_pages in file_text_layer_pages.items():
+            text = PAGE_SEPARATOR.join(file_pages.get(i, []))
+            texts[i] = (text if text else None), self._text_source(text_layer_pages)
+        return texts
+
+    def _preprocessed_pages(self, file_paths: List[str], failed: set) -> Iterator[Tuple[int, Union[str, np.ndarray]]]:
+        """Yield (file index, preprocessed page or text layer) in order, loading and preprocessing in background threads"""
+        # Bounded queue of preprocessing futures, the loader blocks when OCR falls behind
+        pending: queue.Queue = queue.Queue(maxsize=2 * PREPROCESS_WORKERS)
+        closed = threading.Event()
+
+        def put(item):
+            while not closed.is_set():
+                try:
+                    pending.put(item, timeout=0.1)
+                    return
+                except queue.Full:
+                    pass
 
-            # Preprocess image
-            processed_image = self.preprocess_image(image)
+        def load():
+            # PyMuPDF is not thread safe, so a single thread loads every file
+            try:
+                for j, file_path in enumerate(file_paths):
+                    try:
+                        for page in self.load_pages(file_path):
+                            if closed.is_set():
+                                return
+                            put((j, self._page_future(executor, self.preprocess_image, page)))
+                    except Exception as e:
+                        logger.error(f"OCR failed for {file_path}: {e}")
+                        failed.add(j)
+            finally:
+                put(None)
 
-            # Perform OCR
-            config = r'--oem 3 --psm 6'
-            text = pytesseract.image_to_string(processed_image, config=config)
+        with ThreadPoolExecutor(max_workers=PREPROCESS_WORKERS) as executor:
+            loader = threading.Thread(target=load, daemon=True)
+            loader.start()
+            try:
+                while True:
+                    item = pending.get()
+                    if item is None:
+                        break
+                    j, future = item
+                    try:
+                        yield j, future.result()
+                    except Exception as e:
+                        logger.error(f"OCR failed for {file_paths[j]}: {e}")
+                        failed.add(j)
+            finally:
+                closed.set()
+                loader.join()
 
-            return text.strip() if text.strip() else None
+    def _recognize_batch(self, pages: Iterator[Tuple[int, Union[str, np.ndarray]]]
+                         ) -> Optional[List[Tuple[int, str, bool]]]:
+        """Run Tesseract over image list files of up to OCR_BATCH_SIZE pages"""
+        # (file index, page text, from text layer) in page order
+        page_texts = []
+        image_entries = []
+        image_paths = []
 
+        def recognize_images():
+            list_path = os.path.join(tmp_dir, 'list.txt')
+            with open(list_path, 'w', encoding='utf-8') as f:
+                f.write('\n'.join(image_paths) + '\n')
+
+            # Tesseract separates the text of each image with a form feed
+            cmd = [pytesseract.pytesseract.tesseract_cmd, list_path, 'stdout'] + TESSERACT_CONFIG.split()
+            proc = subprocess.run(cmd, capture_output=True, check=True)
+            ocr_texts = proc.stdout.decode('utf-8', errors='replace').split('\x0c')
+            if len(ocr_texts) < len(image_paths):
+                raise RuntimeError(f"expected {len(image_paths)} pages, got {len(ocr_texts)}")
+
+            for k, text in zip(image_entries, ocr_texts):
+                page_texts[k] = (page_texts[k][0], text.strip(), False)
+            for image_path in image_paths:
+                os.remove(image_path)
+            image_entries.clear()
+            image_paths.clear()
+
+        # Any failure, including writing the page images, falls back to per-file OCR
+        try:
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                for j, page in pages:
+                    if isinstance(page, str):
+                        page_texts.append((j, page, True))
+                        continue
+                    image_path = os.path.join(tmp_dir, f'{len(image_paths)}.png')
+                    if not cv2.imwrite(image_path, page):
+                        raise OSError(f"could not write {image_path}")
+                    image_paths.append(image_path)
+                    image_entries.append(len(page_texts))
+                    page_texts.append((j, '', False))
+
+                    # Files are batched by count, so cap the pages of each run too
+                    if len(image_paths) == OCR_BATCH_SIZE:
+                        recognize_images()
+
+                if image_paths:
+                    recognize_images()
         except Exception as e:
-            logger.error(f"OCR failed for {file_path}: {e}")
+            logger.warning(f"Batch OCR failed, falling back to per-file OCR: {e}")
             return None
+
+        return page_texts
     
     def extract_vendor_name(self, text: str) -> str:
         """Extract vendor name from OCR text"""
         lines = [line.strip() for line in text.split('\n') if line.strip()]
         
         # Look for company patterns
-        patterns = [
-            r'([A-Z][A-Za-z\s&\.]+(?:LIMITED|LTD|COMPANY|CORP|INC))',
-            r'([A-Z][A-Za-z\s&\.]{10,50})',
-        ]
-        
-        for pattern in patterns:
-            matches = re.findall(pattern, text, re.IGNORECASE)
+        for pattern in _VENDOR_PATTERNS:
+            matches = pattern.findall(text)
             if matches:
                 return matches[0].strip().title()
         
         # Fallback to first substantial line
         for line in lines[:5]:
-            if len(line) > 10 and not re.match(r'^[\d\s\-\.\,\/]+$', line):
+            if len(line) > 10 and not _NUMERIC_ONLY_RE.match(line):
                 return line.title()
         
         return "UNKNOWN_VENDOR"
     
     def extract_invoice_number(self, text: str) -> str:
         """Extract invoice number from OCR text"""
-        patterns = [
-            r'INVOICE[#\s]*:?\s*([A-Z0-9\-]{3,20})',
-            r'INV[#\s]*:?\s*([A-Z0-9\-]{3,20})',
-            r'NO[#\s]*:?\s*([A-Z0-9\-]{3,20})',
-            r'(?:^|\s)([A-Z]{2,4}-\d{4,8})(?:\s|$)',
-        ]
-        
-        for pattern in patterns:
-            matches = re.findall(pattern, text, re.IGNORECASE | re.MULTILINE)
+        for pattern in _INVNO_PATTERNS:
+            matches = pattern.findall(text)
             for match in matches:
                 clean_match = match.strip()
-                if 3 <= len(clean_match) <= 20 and not re.match(r'^\d{8}$', clean_match):
+                if 3 <= len(clean_match) <= 20 and not _EIGHT_DIGITS_RE.match(clean_match):
                     return clean_match
         
         return "UNKNOWN_INVOICE_NO"
     
     def extract_date(self, text: str) -> str:
         """Extract invoice date from OCR text"""
-        patterns = [
-            r'(\d{1,2}[\/\-\.]\d{1,2}[\/\-\.]\d{4})',
-            r'(\d{1,2}\s+[A-Za-z]{3,9}\s+\d{4})',
-            r'([A-Za-z]{3,9}\s+\d{1,2},?\s+\d{4})',
-        ]
-        
-        for pattern in patterns:
-            matches = re.findall(pattern, text)
+        for pattern in _DATE_PATTERNS:
+            matches = pattern.findall(text)
             for match in matches:
                 if any(year in match for year in ['2020', '2021', '2022', '2023', '2024']):
                     return match.strip()
@@ -191,15 +519,44 @@ class InvoiceScanner:
     
     def extract_line_items(self, text: str) -> List[Dict[str, Any]]:
         """Extract line items table from OCR text"""
+        line_items, _ = self._scan_lines(text)
+        return line_items
+    
+    def extract_grand_total(self, text: str, line_end_amounts: Optional[List[str]] = None) -> float:
+        """Extract grand total from OCR text"""
+        if line_end_amounts is None:
+            _, line_end_amounts = self._scan_lines(text)
+        
+        matches = [match for pattern in _TOTAL_PATTERNS for match in pattern.findall(text)]
+        
+        # Matches hold only digits and at most one '.' once commas are removed
+        values = (match.replace(',', '') for match in matches + line_end_amounts)
+        amounts = np.fromiter((float(value) for value in values if value.strip('.')), dtype=np.float64)
+        in_range = (amounts >= 100) & (amounts <= 50000000)  # Reasonable range
+        
+        return float(amounts[in_range].max()) if in_range.any() else 0.0
+    
+    def _scan_lines(self, text: str) -> Tuple[List[Dict[str, Any]], List[str]]:
+        """Collect line items and end of line amounts from lines holding an amount"""
         line_items = []
-        lines = text.split('\n')
+        line_end_amounts = []
         
-        # Look for table-like structures
-        for i, line in enumerate(lines):
-            # Simple pattern matching for line items
+        # Only lines with an amount hold a line item or a total
+        line_end = -1
+        for amount_match in _AMOUNT_RE.finditer(text):
+            # First amount on each line only
+            if amount_match.start() <= line_end:
+                continue
+            line_start = text.rfind('\n', 0, amount_match.start()) + 1
+            line_end = text.find('\n', amount_match.start())
+            if line_end == -1:
+                line_end = len(text)
+            line = text[line_start:line_end]
+            
+            line_end_amounts.extend(_LINE_END_AMOUNT_RE.findall(line))
+            
             # Look for lines with description and amount
-            amount_match = re.search(r'([\d,]+\.\d{2})', line)
-            if amount_match and len(line.strip()) > 10:
+            if len(line.strip()) > 10:
                 # Extract description (everything before the amount)
                 amount_pos = line.find(amount_match.group(1))
                 description = line[:amount_pos].strip()
@@ -213,28 +570,19 @@ class InvoiceScanner:
                         'amount': amount
                     })
         
-        return line_items
+        return line_items, line_end_amounts
     
-    def extract_grand_total(self, text: str) -> float:
-        """Extract grand total from OCR text"""
-        patterns = [
-            r'TOTAL[:\s]*([\d,]+\.?\d{0,2})',
-            r'GRAND\s*TOTAL[:\s]*([\d,]+\.?\d{0,2})',
-            r'([\d,]+\.\d{2})(?=\s*$)',  # End of line amounts
-        ]
-        
-        amounts = []
-        for pattern in patterns:
-            matches = re.findall(pattern, text, re.IGNORECASE | re.MULTILINE)
-            for match in matches:
-                try:
-                    amount = float(match.replace(',', ''))
-                    if 100 <= amount <= 50000000:  # Reasonable range
-                        amounts.append(amount)
-                except:
-                    pass
-        
-        return max(amounts) if amounts else 0.0
+    def extract_all(self, text: str) -> Dict[str, Any]:
+        """Extract all invoice fields from OCR text"""
+        line_items, line_end_amounts = self._scan_lines(text)
+        return {
+            'vendor_name': self.extract_vendor_name(text),
+            'invoice_number': self.extract_invoice_number(text),
+            'invoice_date': self.extract_date(text),
+            'currency': self.extract_currency(text),
+            'line_items': line_items,
+            'grand_total': self.extract_grand_total(text, line_end_amounts),
+        }
     
     def process_file(self, file_path: str) -> Dict[str, Any]:
         """Process single invoice file"""
@@ -242,22 +590,30 @@ class InvoiceScanner:
         logger.info(f"Processing: {filename}")
         
         # Perform OCR
-        ocr_text = self.perform_ocr(file_path)
+        ocr_text, text_source = self._read_file(file_path)
+        return self._build_result(filename, ocr_text, text_source)
+    
+    def process_batch(self, file_paths: List[str]) -> List[Dict[str, Any]]:
+        """Process several invoice files with batched OCR"""
+        logger.info(f"Processing batch of {len(file_paths)} files")
+        texts = self._read_batch(file_paths)
+        return [self._build_result(os.path.basename(file_path), ocr_text, text_source)
+                for file_path, (ocr_text, text_source) in zip(file_paths, texts)]
+    
+    def _build_result(self, filename: str, ocr_text: Optional[str], text_source: Optional[str] = 'ocr') -> Dict[str, Any]:
+        """Extract structured data from OCR text"""
         if not ocr_text:
             logger.warning(f"No text extracted from {filename}")
-            return self._create_error_result(filename, "OCR_FAILED")
+            return self._create_error_result(filename, "OCR_FAILED", text_source)
         
         # Extract data
         try:
+            fields = self.extract_all(ocr_text)
             result = {
                 'filename': filename,
-                'vendor_name': self.extract_vendor_name(ocr_text),
-                'invoice_number': self.extract_invoice_number(ocr_text),
-                'invoice_date': self.extract_date(ocr_text),
-                'currency': self.extract_currency(ocr_text),
-                'line_items': self.extract_line_items(ocr_text),
-                'grand_total': self.extract_grand_total(ocr_text),
+                **fields,
                 'raw_ocr_text': ocr_text,
+                'text_source': text_source,
                 'processing_timestamp': datetime.now().isoformat()
             }
             
@@ -266,9 +622,9 @@ class InvoiceScanner:
             
         except Exception as e:
             logger.error(f"Data extraction failed for {filename}: {e}")
-            return self._create_error_result(filename, f"EXTRACTION_ERROR: {e}")
+            return self._create_error_result(filename, f"EXTRACTION_ERROR: {e}", text_source)
     
-    def _create_error_result(self, filename: str, error: str) -> Dict[str, Any]:
+    def _create_error_result(self, filename: str, error: str, text_source: Optional[str] = None) -> Dict[str, Any]:
         """Create error result structure"""
         return {
             'filename': filename,
@@ -279,61 +635,117 @@ class InvoiceScanner:
             'line_items': [],
             'grand_total': 0.0,
             'raw_ocr_text': '',
+            'text_source': text_source,
             'processing_timestamp': datetime.now().isoformat(),
             'error': error
         }
     
     def export_to_csv(self, results: List[Dict[str, Any]], output_csv: str):
         """Export results to CSV format as per assignment requirements"""
-        # Create invoices_header.csv (one row per invoice)
-        header_data = []
-        lines_data = []
+        # Create invoices_header.csv (one row per invoice), built column-wise
+        header_columns = ['filename', 'vendor_name', 'invoice_number', 'invoice_date',
+                          'currency', 'grand_total', 'processing_timestamp']
+        line_columns = ['description', 'quantity', 'unit_price', 'amount']
+        header_data = {column: [] for column in header_columns}
+        lines_data = {column: [] for column in ['filename', 'line_number'] + line_columns}
         
         for result in results:
             # Header data
-            header_row = {
-                'filename': result['filename'],
-                'vendor_name': result['vendor_name'],
-                'invoice_number': result['invoice_number'],
-                'invoice_date': result['invoice_date'],
-                'currency': result['currency'],
-                'grand_total': result['grand_total'],
-                'processing_timestamp': result['processing_timestamp']
-            }
-            header_data.append(header_row)
+            for column in header_columns:
+                header_data[column].append(result[column])
             
             # Line items data
             for i, item in enumerate(result['line_items']):
-                line_row = {
-                    'filename': result['filename'],  # Foreign key to header
-                    'line_number': i + 1,
-                    'description': item['description'],
-                    'quantity': item['quantity'],
-                    'unit_price': item['unit_price'],
-                    'amount': item['amount']
-                }
-                lines_data.append(line_row)
+                lines_data['filename'].append(result['filename'])  # Foreign key to header
+                lines_data['line_number'].append(i + 1)
+                for column in line_columns:
+                    lines_data[column].append(item[column])
         
         # Save header CSV
-        header_df = pd.DataFrame(header_data)
         header_csv = output_csv.replace('.csv', '_header.csv')
-        header_df.to_csv(header_csv, index=False)
+        self._write_csv(header_csv, header_data)
         logger.info(f"Header data saved to: {header_csv}")
         
         # Save lines CSV
-        if lines_data:
-            lines_df = pd.DataFrame(lines_data)
+        has_lines = bool(lines_data['filename'])
+        if has_lines:
             lines_csv = output_csv.replace('.csv', '_lines.csv')
-            lines_df.to_csv(lines_csv, index=False)
+            self._write_csv(lines_csv, lines_data)
             logger.info(f"Line items saved to: {lines_csv}")
         
-        return header_csv, lines_csv if lines_data else None
+        return header_csv, lines_csv if has_lines else None
+    
+    def _write_csv(self, path: str, columns: Dict[str, List[Any]]):
+        """Write column lists to a CSV file"""
+        with open(path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f, lineterminator=os.linesep)
+            writer.writerow(columns.keys())
+            writer.writerows(zip(*columns.values()))
     
     def export_to_json(self, results: List[Dict[str, Any]], output_json: str):
         """Export raw results to JSON for audit"""
-        with open(output_json, 'w', encoding='utf-8') as f:
-            json.dump(results, f, indent=2, ensure_ascii=False)
-        logger.info(f"Raw data saved to: {output_json}")
+        with JsonResultWriter(output_json) as writer:
+            for result in results:
+                writer.write(result)
+
+
+def _dumps_json(obj: Any) -> bytes:
+    """Serialize to indented UTF-8 JSON, with orjson when available"""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2)
+    return json.dumps(obj, indent=2, ensure_ascii=False).encode('utf-8')
+
+
+class JsonResultWriter:
+    """Stream results into a JSON array file as they are produced"""
+    
+    def __init__(self, output_json: str):
+        """Open output file and start the array"""
+        self.output_json = output_json
+        self._file = open(output_json, 'wb')
+        self._file.write(b'[')
+        self._count = 0
+    
+    def write(self, result: Dict[str, Any]):
+        """Append one result to the array"""
+        # Same layout as dumping the whole list with indent=2
+        item = _dumps_json(result).replace(b'\n', b'\n  ')
+        self._file.write((b',\n  ' if self._count else b'\n  ') + item)
+        self._count += 1
+    
+    def close(self):
+        """Close the array and the output file"""
+        self._file.write(b'\n]' if self._count else b']')
+        self._file.close()
+        logger.info(f"Raw data saved to: {self.output_json}")
+    
+    def __enter__(self) -> 'JsonResultWriter':
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+# Per-process scanner used by pool workers, created lazily on first use
+_worker_scanner: Optional[InvoiceScanner] = None
+_worker_pid: Optional[int] = None
+
+
+def _get_scanner(tesseract_path: str = None, denoise: str = 'median',
+                 page_workers: int = PAGE_WORKERS) -> InvoiceScanner:
+    """Return the scanner for the current process, creating it if needed"""
+    global _worker_scanner, _worker_pid
+    if _worker_scanner is None or _worker_pid != os.getpid():
+        _worker_scanner = InvoiceScanner(tesseract_path=tesseract_path, denoise=denoise,
+                                         page_workers=page_workers)
+        _worker_pid = os.getpid()
+    return _worker_scanner
+
+
+def _process_batch(file_paths: List[str], tesseract_path: str = None, denoise: str = 'median',
+                   page_workers: int = PAGE_WORKERS) -> List[Dict[str, Any]]:
+    """Process a batch of invoice files in a worker process"""
+    return _get_scanner(tesseract_path, denoise, page_workers).process_batch(file_paths)
 
 
 def main():
@@ -343,11 +755,15 @@ def main():
     parser.add_argument('--out_csv', required=True, help='Output CSV file path')
     parser.add_argument('--out_json', required=True, help='Output JSON file path')
     parser.add_argument('--tesseract_path', help='Path to Tesseract executable')
+    parser.add_argument('--workers', type=int, default=min(os.cpu_count() or 1, 8),
+                        help='Number of worker processes (default: CPU count, max 8)')
+    parser.add_argument('--denoise', choices=DENOISE_METHODS, default='median',
+                        help='Image denoising method applied before OCR (default: median)')
     
     args = parser.parse_args()
     
     # Initialize scanner
-    scanner = InvoiceScanner(tesseract_path=args.tesseract_path)
+    scanner = InvoiceScanner(tesseract_path=args.tesseract_path, denoise=args.denoise)
     
     # Scan directory
     files = scanner.scan_directory(args.in_dir)
@@ -355,15 +771,36 @@ def main():
         logger.error("No supported files found")
         sys.exit(1)
     
-    # Process files
+    # Process files in parallel, one scanner per worker process and
+    # one Tesseract run per batch. Results are streamed to the JSON file
+    # in scan order as batches finish, only the fields needed for the CSV
+    # are kept.
     results = []
-    for file_path in files:
-        result = scanner.process_file(file_path)
-        results.append(result)
+    max_workers = max(1, min(args.workers, len(files)))
+    batch_size = min(OCR_BATCH_SIZE, -(-len(files) // max_workers))
+    batches = [files[i:i + batch_size] for i in range(0, len(files), batch_size)]
+    # Page OCR threads in each worker share the remaining cores, so the
+    # pool never runs more than about one Tesseract process per core
+    page_workers = min(PAGE_WORKERS, max(1, (os.cpu_count() or 1) // max_workers))
+    with JsonResultWriter(args.out_json) as json_writer, \
+            ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = [(executor.submit(_process_batch, batch, args.tesseract_path, args.denoise,
+                                    page_workers), batch)
+                   for batch in batches]
+        for future, batch in futures:
+            try:
+                batch_results = future.result()
+            except Exception as e:
+                logger.error(f"Worker failed: {e}")
+                batch_results = [scanner._create_error_result(os.path.basename(file_path), f"WORKER_ERROR: {e}")
+                                 for file_path in batch]
+            for result in batch_results:
+                json_writer.write(result)
+                result.pop('raw_ocr_text', None)
+                results.append(result)
     
     # Export results
     header_csv, lines_csv = scanner.export_to_csv(results, args.out_csv)
-    scanner.export_to_json(results, args.out_json)
     
     # Summary
     successful = len([r for r in results if 'error' not in r])